@@ -1,23 +1,96 @@
 import pandas as pd
+import numpy as np
 import sqlite3
+import csv
 import logging
 import sys 
 from datetime import datetime
 import os
+from concurrent.futures import ProcessPoolExecutor
+from importlib.util import find_spec
 import xlsxwriter
-import matplotlib.pyplot as plt
+
+# Numba is optional; without it the pay kernel falls back to vectorized NumPy
+try:
+    from numba import njit, prange, set_num_threads
+    HAS_NUMBA = True
+except ImportError:
+    HAS_NUMBA = False
+
+# The Rust-based calamine reader is much faster than openpyxl; use it when python-calamine is installed
+EXCEL_ENGINE = 'calamine' if find_spec('python_calamine') else None  # None: pandas default (openpyxl)
+
+# Arrow-backed strings run strip/title in vectorized kernels; fall back to pandas' own string dtype
+TEXT_DTYPE = 'string[pyarrow]' if find_spec('pyarrow') else 'string'
 
 # Get the directory where the script is located
 SCRIPT_DIR = os.path.dirname(os.path.abspath(__file__))
 DB_PATH = os.path.join(SCRIPT_DIR, 'payroll_data.db')
 
+# One timestamp per run, shared by every output file name
+RUN_TS = datetime.now().strftime("%Y-%m-%d_%H-%M-%S")
+
+# Rows read per chunk when streaming CSV inputs
+CSV_CHUNK_SIZE = 100_000
+
+# Rows per multi-row INSERT; capped so a statement stays under SQLite's bound-parameter limit
+
+# Single-writer ETL load: skip fsync barriers and keep the journal/temp tables in memory
+BULK_LOAD_PRAGMAS = """
+PRAGMA synchronous=OFF;
+PRAGMA journal_mode=MEMORY;
+PRAGMA temp_store=MEMORY;
+PRAGMA cache_size=-200000;
+"""
+
+# Indexes for the grouped/ordered report queries; built after the bulk insert to avoid per-row maintenance
+PAYROLL_INDEXES = """
+CREATE INDEX IF NOT EXISTS idx_pr_dept ON payroll_records(Department);
+CREATE INDEX IF NOT EXISTS idx_pr_paydate ON payroll_records([Pay Date]);
+CREATE INDEX IF NOT EXISTS idx_pr_netpay ON payroll_records([Net Pay] DESC);
+CREATE INDEX IF NOT EXISTS idx_pr_month ON payroll_records(Month);
+"""
+
+# Analysis queries shared by run_analysis and export_all_reports
+QUERIES = {
+    'top_earners': """
+    SELECT [Emp ID], [Emp Name], [Department], [Net Pay]
+    FROM payroll_records
+    ORDER BY [Net Pay] DESC
+    LIMIT 5
+    """,
+    'monthly_payroll_summary': """
+    SELECT Month, SUM([Net Pay]) as Total_Net_Pay
+    FROM payroll_records
+    GROUP BY Month
+    ORDER BY Month
+    """,
+    'avg_hours_by_department': """
+    SELECT Department, AVG([Hours Worked]) as Avg_Hours_Worked
+    FROM payroll_records
+    GROUP BY Department
+    """,
+}
+
+# Rows per chunk when streaming full tables out to CSV
+EXPORT_CHUNK_SIZE = 50_000
+
+DEPT_SUMMARY_QUERY = """
+SELECT Department, SUM([Gross Pay]) as [Gross Pay], SUM(Tax) as Tax, SUM([Net Pay]) as [Net Pay], COUNT([Emp ID]) as [Employee Count]
+FROM payroll_records
+WHERE Department IS NOT NULL
+GROUP BY Department
+ORDER BY Department
+"""
+
 def print_file_locations():
     """Print information about where files are saved"""
     print(f"\n{'='*60}")
     print("FILE LOCATIONS:")
     print(f"Script Directory: {SCRIPT_DIR}")
     print(f"Database: {DB_PATH}")
-    print(f"Excel Files: {SCRIPT_DIR}")
+    print(f"Parquet Files: {SCRIPT_DIR}")
+    print(f"Excel Files (--excel): {SCRIPT_DIR}")
     print(f"Export Folders: {SCRIPT_DIR}/payroll_exports_[timestamp]")
     print(f"{'='*60}\n")
 
@@ -28,15 +101,56 @@ logging.basicConfig(
 )
 
 def extract(file_path):
+    """Yield the input file as one or more DataFrames; CSVs are streamed in chunks"""
     logging.info(f"Extracting data from {file_path}...")
     # Handle both CSV and Excel files
     if file_path.endswith('.csv'):
-        return pd.read_csv(file_path)
+        yield from pd.read_csv(file_path, chunksize=CSV_CHUNK_SIZE)
     elif file_path.endswith(('.xlsx', '.xls')):
-        return pd.read_excel(file_path)
+        # Excel readers have no chunked mode, so the sheet comes back as a single chunk
+        yield pd.read_excel(file_path, engine=EXCEL_ENGINE)
     else:
         logging.error(f"Unsupported file format: {file_path}")
-        return None
+
+
+def compute_pay_numpy(hourly_rate, hours, rates, codes, default_rate):
+    """Vectorized pay calculation: returns gross, tax rate, tax, net, overtime, regular hours and overtime mask"""
+    # Everything is computed in the dtype of hours, matching the Numba kernel
+    dtype = hours.dtype
+    tax_rate = np.where(codes >= 0, rates.astype(dtype).take(codes.clip(min=0)), dtype.type(default_rate))
+    gross = hourly_rate.astype(dtype) * hours
+    tax = gross * tax_rate
+    net = gross - tax
+    overtime = np.maximum(hours - 40, 0)
+    regular = np.minimum(hours, 40)
+    return gross, tax_rate, tax, net, overtime, regular, hours > 40
+
+if HAS_NUMBA:
+    @njit(parallel=True, cache=True)
+    def compute_pay(hourly_rate, hours, rates, codes, default_rate):
+        """Fused pay calculation in a single parallel sweep over the rows"""
+        n = hours.shape[0]
+        gross = np.empty(n, hours.dtype)
+        tax_rate = np.empty(n, hours.dtype)
+        tax = np.empty(n, hours.dtype)
+        net = np.empty(n, hours.dtype)
+        overtime = np.empty(n, hours.dtype)
+        regular = np.empty(n, hours.dtype)
+        is_overtime = np.empty(n, dtype=np.bool_)
+        for i in prange(n):
+            h = hours[i]
+            # Each value is stored before it is reused, so every step rounds to the dtype of hours
+            # exactly as compute_pay_numpy does
+            tax_rate[i] = rates[codes[i]] if codes[i] >= 0 else default_rate
+            gross[i] = hourly_rate[i] * h
+            tax[i] = gross[i] * tax_rate[i]
+            net[i] = gross[i] - tax[i]
+            overtime[i] = max(h - 40.0, 0.0)
+            regular[i] = min(h, 40.0)
+            is_overtime[i] = h > 40
+        return gross, tax_rate, tax, net, overtime, regular, is_overtime
+else:
+    compute_pay = compute_pay_numpy
 
 
 def transform(df):
@@ -55,21 +169,25 @@ def transform(df):
             return None
     logging.info("All required columns are present.")
 
-    # Check for missing columns
-    missing_cols = [col for col in required_cols if col not in df.columns]
-    if missing_cols:
-        logging.error(f"Missing columns in input file: {', '.join(missing_cols)}")
-        return None
-
     # Striping the whitespace and standardize text columns
+    df = df.astype({'Emp Name': TEXT_DTYPE, 'Department': TEXT_DTYPE, 'Notes': TEXT_DTYPE})
     df['Emp Name'] = df['Emp Name'].str.strip().str.title()
     df['Department'] = df['Department'].str.strip().str.title()
     df['Notes'] = df['Notes'].fillna('').str.strip()
-    df['Pay Date'] = pd.to_datetime(df['Pay Date'])
+    # Excel inputs arrive already parsed; text dates are ISO-8601, and bad values become NaT
+    if not pd.api.types.is_datetime64_any_dtype(df['Pay Date']):
+        pay_dates = pd.to_datetime(df['Pay Date'], format='ISO8601', errors='coerce')
+        coerced = int((pay_dates.isna() & df['Pay Date'].notna()).sum())
+        if coerced:
+            logging.warning(f"Dropping {coerced} row(s) with a Pay Date that is not ISO-8601 (YYYY-MM-DD)")
+        df['Pay Date'] = pay_dates
 
     # Drop rows with missing or invalid dates
     df = df.dropna(subset=['Pay Date'])
 
+    # Store the reporting month so monthly summaries can group on an indexed column
+    df['Month'] = df['Pay Date'].dt.strftime('%Y-%m')
+
     df = df[(df['Hourly Rate'] > 0) & (df['Hours Worked'] > 0)]
 
     # Calculate tax based on department
@@ -81,56 +199,126 @@ def transform(df):
         'Marketing' : 0.13
     }
     
-    # calculate Gross Pay, Net Pay, and flag hours worked
-    df['Gross Pay'] = df['Hourly Rate'] * df['Hours Worked']
-    df['Hours Flag'] = df['Hours Worked'].apply(lambda x: 'Overtime' if x > 40 else 'Regular')
-
-    # Apply tax rates based on department
-    df['Tax Rate'] = df['Department'].map(tax_rates).fillna(0.10)  # Default tax rate if department not found
-    df['Tax'] = df['Gross Pay'] * df['Tax Rate']
-    df['Net Pay'] = df['Gross Pay'] - df['Tax']
+    # Look up each department's rate by its position in the table; unknown or missing departments (-1) get the default
+    codes = pd.Index(list(tax_rates)).get_indexer(df['Department'])
+    rates = np.array(list(tax_rates.values()), dtype='float64')
+
+    # calculate Gross Pay, Tax, Net Pay and overtime split in one pass over the raw arrays
+    gross, tax_rate, tax, net, overtime, regular, is_overtime = compute_pay(
+        df['Hourly Rate'].to_numpy(dtype='float64'),
+        df['Hours Worked'].to_numpy(dtype='float64'),
+        rates,
+        codes.astype('int64'),
+        0.10  # Default tax rate if department not found
+    )
+
+    df['Gross Pay'] = gross
+    df['Hours Flag'] = np.where(is_overtime, 'Overtime', 'Regular')
+    df['Tax Rate'] = tax_rate
+    df['Tax'] = tax
+    df['Net Pay'] = net
 
     # New columns for reporting overtime worked
-    df['Overtime Hours'] = df['Hours Worked'].apply(lambda x: x - 40 if x > 40 else 0)
-    df['Regular Hours'] = df['Hours Worked'].apply(lambda x: 40 if x > 40 else x)
-
-    # Group by department and calculate summary statistics
-    dept_summary = df.groupby('Department').agg({
-        'Gross Pay': 'sum',
-        'Tax': 'sum',
-        'Net Pay': 'sum',
-        'Emp ID': 'count'
-    }).reset_index()
-
-    # Rename columns 
-    dept_summary.rename(columns={
-        'Emp ID': 'Employee Count'
-    }, inplace=True)
-
-    timestamp = datetime.now().strftime("%Y-%m-%d_%H-%M-%S")
+    df['Overtime Hours'] = overtime
+    df['Regular Hours'] = regular
 
     # Check for hours worked over 40 and flag them
     warnings = df[df['Hours Flag'] == 'Overtime']
 
-    # Export Results to script directory
-    df.to_excel(os.path.join(SCRIPT_DIR, f'cleaned_processed_payroll_{timestamp}.xlsx'), index=False, engine='xlsxwriter')
-    dept_summary.to_excel(os.path.join(SCRIPT_DIR, f'department_summary_{timestamp}.xlsx'), index=False, engine='xlsxwriter')
-    warnings.to_excel(os.path.join(SCRIPT_DIR, f'hours_warning_report_{timestamp}.xlsx'), index=False, engine='xlsxwriter')
-    
-    print(f"\nExcel files exported successfully ({timestamp})!")
-    logging.info(f"Data successfully transformed and exported to Excel files")
+    logging.info(f"Data successfully transformed")
         
-    return df, dept_summary, warnings
+    return df, warnings
     
 
-def load(df, dept_summary, warnings):
-    logging.info("Loading data into SQLite database...")
-    conn = sqlite3.connect(DB_PATH)
-    df.to_sql('payroll_records', conn, if_exists='append', index=False)
-    dept_summary.to_sql('department_summary', conn, if_exists='append', index=False)
-    warnings.to_sql('overtime_warnings', conn, if_exists='append', index=False)
-    conn.close()
-    logging.info("Data successfully loaded into SQLite database")
+def create_table(chunk, table_name, conn):
+    """Replace a table with an empty one shaped like the chunk"""
+    conn.execute(f'DROP TABLE IF EXISTS "{table_name}"')
+    conn.execute(pd.io.sql.get_schema(chunk, table_name, con=conn))
+
+def insert_chunk(chunk, table_name, conn):
+    """Append one chunk to a table with executemany"""
+    columns = ', '.join(f'"{col}"' for col in chunk.columns)
+    placeholders = ', '.join('?' * len(chunk.columns))
+    insert_sql = f'INSERT INTO "{table_name}" ({columns}) VALUES ({placeholders})'
+    # sqlite3 can only bind plain Python values: format dates as to_sql does and turn NA into None
+    chunk = chunk.copy()
+    for col in chunk.select_dtypes(include='datetime').columns:
+        chunk[col] = chunk[col].dt.strftime('%Y-%m-%d %H:%M:%S')
+    chunk = chunk.astype(object).where(chunk.notna(), None)
+    conn.executemany(insert_sql, chunk.itertuples(index=False, name=None))
+
+def align_chunk(chunk, columns, table_name):
+    """Reorder a chunk to the table's columns, dropping extras with a warning and filling missing ones with NULL"""
+    extra = chunk.columns.difference(columns)
+    if len(extra):
+        logging.warning(f"Dropping columns not in {table_name}: {', '.join(extra)}")
+    missing = columns.difference(chunk.columns)
+    if len(missing):
+        # All-None object columns convert to whatever type the table and Parquet schema already use
+        chunk = chunk.assign(**{col: pd.Series(None, index=chunk.index, dtype=object) for col in missing})
+    return chunk[columns]
+
+class ChunkFileWriter:
+    """Append DataFrame chunks to a Parquet file and, optionally, an Excel workbook"""
+
+    def __init__(self, name, parquet=True, excel=False):
+        self.parquet_path = f"{SCRIPT_DIR}/{name}_{RUN_TS}.parquet" if parquet else None
+        self.excel_path = f"{SCRIPT_DIR}/{name}_{RUN_TS}.xlsx" if excel else None
+        self.parquet_writer = None
+        self.excel_writer = None
+        self.excel_row = 0
+
+    def write(self, chunk):
+        if self.parquet_path:
+            import pyarrow as pa
+            import pyarrow.parquet as pq
+
+            if self.parquet_writer is None:
+                table = pa.Table.from_pandas(chunk, preserve_index=False)
+                self.parquet_writer = pq.ParquetWriter(self.parquet_path, table.schema, compression='snappy')
+            else:
+                table = pa.Table.from_pandas(chunk, schema=self.parquet_writer.schema, preserve_index=False)
+            self.parquet_writer.write_table(table)
+        if self.excel_path:
+            if self.excel_writer is None:
+                self.excel_writer = pd.ExcelWriter(self.excel_path, engine='xlsxwriter')
+            header = self.excel_row == 0
+            chunk.to_excel(self.excel_writer, sheet_name='Sheet1', startrow=self.excel_row, header=header, index=False)
+            self.excel_row += len(chunk) + header
+
+    def close(self):
+        if self.parquet_writer is not None:
+            self.parquet_writer.close()
+        if self.excel_writer is not None:
+            self.excel_writer.close()
+
+def process_file(file_path):
+    """Extract and transform one input file, yielding the (data, warnings) result of each chunk as it is read"""
+    logging.info(f"Processing file: {file_path}")
+    for raw_data in extract(file_path):
+        result = transform(raw_data)
+        if result is not None:
+            yield result
+
+def collect_file(file_path):
+    """Run process_file to completion; pool workers have to return a picklable list"""
+    return list(process_file(file_path))
+
+def init_worker():
+    """Run the Numba kernel on one thread per pool worker; the pool already spreads the files over the cores"""
+    if HAS_NUMBA:
+        set_num_threads(1)
+
+def process_files(file_paths):
+    """Yield each file's chunk results in input order, fanning out across processes when there are several files"""
+    # Files are independent until aggregation; the pool never outnumbers the files or the cores.
+    # A single file runs in-process and streams, so only one chunk is held at a time
+    max_workers = min(len(file_paths), os.cpu_count() or 1)
+    if max_workers <= 1:
+        yield from map(process_file, file_paths)
+        return
+    with ProcessPoolExecutor(max_workers=max_workers, initializer=init_worker) as executor:
+        yield from executor.map(collect_file, file_paths)
 
 def validate_load():
     logging.info("Validating data load...")
@@ -144,37 +332,63 @@ def validate_load():
     else:
         logging.error("Data validation failed. No records found in the database.")
     
-def load_aggregated(all_dataframes, all_dept_summaries, all_warnings):
+def load_aggregated(file_results, export_to_excel=False):
+    """Stream every chunk into SQLite and the Parquet/Excel exports; returns None if there were no chunks"""
     logging.info("Loading aggregated data into SQLite database...")
+    # Excel is opt-in, and also the fallback when pyarrow is missing
+    write_parquet = find_spec('pyarrow') is not None
+    if not write_parquet:
+        logging.warning("pyarrow is not installed; writing Excel files instead of Parquet")
+    write_excel = export_to_excel or not write_parquet
+    writers = {
+        'payroll_records': ChunkFileWriter('cleaned_processed_payroll', write_parquet, write_excel),
+        'overtime_warnings': ChunkFileWriter('hours_warning_report', write_parquet, write_excel),
+        'department_summary': ChunkFileWriter('department_summary', write_parquet, write_excel),
+    }
     conn = sqlite3.connect(DB_PATH)
+    conn.executescript(BULK_LOAD_PRAGMAS)
+    final_dept_summary = None
     
-    # Combine all dataframes
-    combined_df = pd.concat(all_dataframes, ignore_index=True)
-    combined_warnings = pd.concat(all_warnings, ignore_index=True)
-    
-    # Aggregate department summaries properly
-    combined_dept_summary = pd.concat(all_dept_summaries, ignore_index=True)
-    final_dept_summary = combined_dept_summary.groupby('Department').agg({
-        'Gross Pay': 'sum',
-        'Tax': 'sum', 
-        'Net Pay': 'sum',
-        'Employee Count': 'sum'
-    }).reset_index()
-    
-    # Load to database
-    combined_df.to_sql('payroll_records', conn, if_exists='replace', index=False)
-    final_dept_summary.to_sql('department_summary', conn, if_exists='replace', index=False)
-    combined_warnings.to_sql('overtime_warnings', conn, if_exists='replace', index=False)
+    try:
+        # One transaction for the whole load; each chunk is written out and released as it arrives
+        with conn:
+            conn.execute("BEGIN")
+            loaded_any = False
+            # Each table keeps the first chunk's columns, so files with a different column order or set still line up
+            table_columns = {}
+            for chunks in file_results:
+                for cleaned_data, warnings in chunks:
+                    for table_name, chunk in (('payroll_records', cleaned_data), ('overtime_warnings', warnings)):
+                        if table_name in table_columns:
+                            chunk = align_chunk(chunk, table_columns[table_name], table_name)
+                        else:
+                            create_table(chunk, table_name, conn)
+                            table_columns[table_name] = chunk.columns
+                        insert_chunk(chunk, table_name, conn)
+                        writers[table_name].write(chunk)
+                    loaded_any = True
+            
+            if loaded_any:
+                final_dept_summary = pd.read_sql_query(DEPT_SUMMARY_QUERY, conn)
+                # Written with executemany rather than to_sql, which would commit partway through the load
+                create_table(final_dept_summary, 'department_summary', conn)
+                insert_chunk(final_dept_summary, 'department_summary', conn)
+                writers['department_summary'].write(final_dept_summary)
+        if loaded_any:
+            conn.executescript(PAYROLL_INDEXES)
+    finally:
+        for writer in writers.values():
+            writer.close()
+        conn.close()
     
-    conn.close()
-    logging.info("Aggregated data successfully loaded into SQLite database")
+    if final_dept_summary is not None:
+        logging.info("Aggregated data successfully loaded into SQLite database")
+        print(f"\n{'Parquet/Excel' if write_parquet and write_excel else 'Parquet' if write_parquet else 'Excel'} files exported successfully ({RUN_TS})!")
     return final_dept_summary
 
-
 def create_export_folder():
     """Create a timestamped folder for exports in the script directory"""
-    timestamp = datetime.now().strftime("%Y-%m-%d_%H-%M-%S")
-    folder_name = f"payroll_exports_{timestamp}"
+    folder_name = f"payroll_exports_{RUN_TS}"
     folder_path = os.path.join(SCRIPT_DIR, folder_name)
     
     if not os.path.exists(folder_path):
@@ -183,43 +397,60 @@ def create_export_folder():
     
     return folder_path
 
-def top_earners(export_csv=True, export_folder=None):
-    conn = sqlite3.connect(DB_PATH)
-    query = """
-    SELECT [Emp ID], [Emp Name], [Department], [Net Pay]
-    FROM payroll_records
-    ORDER BY [Net Pay] DESC
-    LIMIT 5
-    """
-    
-    result = pd.read_sql_query(query, conn)
-    conn.close()
+def ensure_month_column(conn):
+    """Backfill the indexed Month column on databases loaded before it existed"""
+    columns = [row[1] for row in conn.execute("PRAGMA table_info(payroll_records)")]
+    if columns and 'Month' not in columns:
+        logging.info("Adding Month column to existing payroll_records table...")
+        with conn:
+            conn.execute("ALTER TABLE payroll_records ADD COLUMN Month TEXT")
+            conn.execute("UPDATE payroll_records SET Month = strftime('%Y-%m', [Pay Date])")
+            conn.execute("CREATE INDEX IF NOT EXISTS idx_pr_month ON payroll_records(Month)")
+
+def write_csv_rows(csv_filename, columns, rows):
+    """Write a small query result straight to CSV without building a DataFrame"""
+    with open(csv_filename, 'w', newline='', encoding='utf-8') as f:
+        writer = csv.writer(f, lineterminator='\n')
+        writer.writerow(columns)
+        writer.writerows(rows)
+
+def top_earners(export_csv=True, export_folder=None, conn=None):
+    own_conn = conn is None
+    if own_conn:
+        conn = sqlite3.connect(DB_PATH)
+    cursor = conn.execute(QUERIES['top_earners'])
+    rows = cursor.fetchall()
+    columns = [d[0] for d in cursor.description]
+    if own_conn:
+        conn.close()
     
-    if export_csv and not result.empty and export_folder:
-        timestamp = datetime.now().strftime("%Y-%m-%d_%H-%M-%S")
-        csv_filename = os.path.join(export_folder, f'top_earners_{timestamp}.csv')
-        result.to_csv(csv_filename, index=False)
+    if export_csv and rows and export_folder:
+        csv_filename = f"{export_folder}/top_earners_{RUN_TS}.csv"
+        write_csv_rows(csv_filename, columns, rows)
         logging.info(f"Top earners exported to {csv_filename}")
         print(f"Exported to: {csv_filename}")
     
+    result = pd.DataFrame.from_records(rows, columns=columns)
     logging.info("Top 5 earners retrieved successfully.")
     print(result)
     return result
 
-def monthly_payroll_summary(export_csv=True, export_folder=None):
-    conn = sqlite3.connect(DB_PATH)
-    query = """
-    SELECT strftime('%Y-%m', [Pay Date]) as Month, SUM([Net Pay]) as Total_Net_Pay
-    FROM payroll_records
-    GROUP BY strftime('%Y-%m', [Pay Date])
-    ORDER BY Month
-    """
-    
-    result = pd.read_sql_query(query, conn)
-    conn.close()
+def monthly_payroll_summary(export_csv=True, export_folder=None, conn=None):
+    own_conn = conn is None
+    if own_conn:
+        conn = sqlite3.connect(DB_PATH)
+    ensure_month_column(conn)
+    result = pd.read_sql_query(QUERIES['monthly_payroll_summary'], conn)
+    if own_conn:
+        conn.close()
     
     # Plotting data if available
     if not result.empty:
+        # Imported lazily so ETL-only runs skip matplotlib startup; Agg renders without a GUI
+        import matplotlib
+        matplotlib.use('Agg')
+        import matplotlib.pyplot as plt
+
         plt.figure(figsize=(10, 6)) 
         plt.bar(result['Month'], result['Total_Net_Pay']) 
         plt.xlabel("Month")
@@ -238,15 +469,13 @@ def monthly_payroll_summary(export_csv=True, export_folder=None):
             plt.savefig(chart_path)
             print(f"Chart saved to: {chart_path}")
         
-        plt.show()
         plt.close()  
     else:
         print("No data available for plotting.")
     
     # Export CSV if requested
     if export_csv and not result.empty and export_folder:
-        timestamp = datetime.now().strftime("%Y-%m-%d_%H-%M-%S")
-        csv_filename = os.path.join(export_folder, f'monthly_payroll_summary_{timestamp}.csv')
+        csv_filename = f"{export_folder}/monthly_payroll_summary_{RUN_TS}.csv"
         result.to_csv(csv_filename, index=False)
         logging.info(f"Monthly summary exported to {csv_filename}")
         print(f"Exported to: {csv_filename}")
@@ -255,20 +484,16 @@ def monthly_payroll_summary(export_csv=True, export_folder=None):
     print(result)
     return result
 
-def avg_hours_by_department(export_csv=True, export_folder=None):
-    conn = sqlite3.connect(DB_PATH)
-    query = """
-    SELECT Department, AVG([Hours Worked]) as Avg_Hours_Worked
-    FROM payroll_records
-    GROUP BY Department
-    """
-    
-    result = pd.read_sql_query(query, conn)
-    conn.close()
+def avg_hours_by_department(export_csv=True, export_folder=None, conn=None):
+    own_conn = conn is None
+    if own_conn:
+        conn = sqlite3.connect(DB_PATH)
+    result = pd.read_sql_query(QUERIES['avg_hours_by_department'], conn)
+    if own_conn:
+        conn.close()
     
     if export_csv and not result.empty and export_folder:
-        timestamp = datetime.now().strftime("%Y-%m-%d_%H-%M-%S")
-        csv_filename = os.path.join(export_folder, f'avg_hours_by_department_{timestamp}.csv')
+        csv_filename = f"{export_folder}/avg_hours_by_department_{RUN_TS}.csv"
         result.to_csv(csv_filename, index=False)
         logging.info(f"Average hours by department exported to {csv_filename}")
         print(f"Exported to: {csv_filename}")
@@ -277,100 +502,77 @@ def avg_hours_by_department(export_csv=True, export_folder=None):
     print(result)
     return result
 
-def export_all_reports(export_folder):
-    """Export all SQL query results to CSV files in specified folder"""
+def export_table_csv(conn, table_name, csv_filename):
+    """Stream a full table to CSV in chunks; returns False if the table is empty"""
+    wrote_rows = False
+    for chunk in pd.read_sql_query(f"SELECT * FROM {table_name}", conn, chunksize=EXPORT_CHUNK_SIZE):
+        if chunk.empty:
+            continue
+        chunk.to_csv(csv_filename, mode='a' if wrote_rows else 'w', header=not wrote_rows, index=False)
+        wrote_rows = True
+    return wrote_rows
+
+def export_all_reports(export_folder, analysis_results=None):
+    """Export all SQL query results to CSV files in specified folder, reusing results from run_analysis"""
+    analysis_results = analysis_results or {}
+    conn = None
     try:
-        timestamp = datetime.now().strftime("%Y-%m-%d_%H-%M-%S")
+        conn = sqlite3.connect(DB_PATH)
+        ensure_month_column(conn)
+        
+        def report(name):
+            if name in analysis_results:
+                return analysis_results[name]
+            return pd.read_sql_query(QUERIES[name], conn)
         
         print(f"\n{'='*60}")
-        print(f"EXPORTING ALL REPORTS TO CSV - {timestamp}")
+        print(f"EXPORTING ALL REPORTS TO CSV - {RUN_TS}")
         print(f"Export Folder: {export_folder}")
         print(f"{'='*60}")
         
         # Export top earners 
         print("\n1. Exporting Top Earners...")
-        conn = sqlite3.connect(DB_PATH)
-        top_query = """
-        SELECT [Emp ID], [Emp Name], [Department], [Net Pay]
-        FROM payroll_records
-        ORDER BY [Net Pay] DESC
-        LIMIT 5
-        """
-        top_df = pd.read_sql_query(top_query, conn)
-        conn.close()
+        top_df = report('top_earners')
         
         if not top_df.empty:
-            top_csv = os.path.join(export_folder, f'top_earners_{timestamp}.csv')
+            top_csv = f"{export_folder}/top_earners_{RUN_TS}.csv"
             top_df.to_csv(top_csv, index=False)
             print(f"Top earners exported to: {top_csv}")
 
         # Export monthly summary
         print("\n2. Exporting Monthly Payroll Summary...")
-        conn = sqlite3.connect(DB_PATH)
-        monthly_query = """
-        SELECT strftime('%Y-%m', [Pay Date]) as Month, SUM([Net Pay]) as Total_Net_Pay
-        FROM payroll_records
-        GROUP BY strftime('%Y-%m', [Pay Date])
-        ORDER BY Month
-        """
-        monthly_df = pd.read_sql_query(monthly_query, conn)
-        conn.close()
+        monthly_df = report('monthly_payroll_summary')
         
         if not monthly_df.empty:
-            monthly_csv = os.path.join(export_folder, f'monthly_payroll_summary_{timestamp}.csv')
+            monthly_csv = f"{export_folder}/monthly_payroll_summary_{RUN_TS}.csv"
             monthly_df.to_csv(monthly_csv, index=False)
             print(f"Monthly summary exported to: {monthly_csv}")
 
         # Export department hours
         print("\n3. Exporting Average Hours by Department...")
-        conn = sqlite3.connect(DB_PATH)
-        dept_hours_query = """
-        SELECT Department, AVG([Hours Worked]) as Avg_Hours_Worked
-        FROM payroll_records
-        GROUP BY Department
-        """
-        dept_hours_df = pd.read_sql_query(dept_hours_query, conn)
-        conn.close()
+        dept_hours_df = report('avg_hours_by_department')
         
         if not dept_hours_df.empty:
-            dept_hours_csv = os.path.join(export_folder, f'avg_hours_by_department_{timestamp}.csv')
+            dept_hours_csv = f"{export_folder}/avg_hours_by_department_{RUN_TS}.csv"
             dept_hours_df.to_csv(dept_hours_csv, index=False)
             print(f"Average hours by department exported to: {dept_hours_csv}")
         
         # Export complete payroll records
         print("\n4. Exporting Complete Payroll Records...")
-        conn = sqlite3.connect(DB_PATH)
-        full_query = "SELECT * FROM payroll_records"
-        full_df = pd.read_sql_query(full_query, conn)
-        conn.close()
-        
-        if not full_df.empty:
-            full_csv = os.path.join(export_folder, f'complete_payroll_records_{timestamp}.csv')
-            full_df.to_csv(full_csv, index=False)
+        full_csv = f"{export_folder}/complete_payroll_records_{RUN_TS}.csv"
+        if export_table_csv(conn, 'payroll_records', full_csv):
             print(f"Complete records exported to: {full_csv}")
         
         # Export department summary
         print("\n5. Exporting Department Summary...")
-        conn = sqlite3.connect(DB_PATH)
-        dept_query = "SELECT * FROM department_summary"
-        dept_df = pd.read_sql_query(dept_query, conn)
-        conn.close()
-        
-        if not dept_df.empty:
-            dept_csv = os.path.join(export_folder, f'department_summary_{timestamp}.csv')
-            dept_df.to_csv(dept_csv, index=False)
+        dept_csv = f"{export_folder}/department_summary_{RUN_TS}.csv"
+        if export_table_csv(conn, 'department_summary', dept_csv):
             print(f"Department summary exported to: {dept_csv}")
         
         # Export overtime warnings
         print("\n6. Exporting Overtime Warnings...")
-        conn = sqlite3.connect(DB_PATH)
-        overtime_query = "SELECT * FROM overtime_warnings"
-        overtime_df = pd.read_sql_query(overtime_query, conn)
-        conn.close()
-        
-        if not overtime_df.empty:
-            overtime_csv = os.path.join(export_folder, f'overtime_warnings_{timestamp}.csv')
-            overtime_df.to_csv(overtime_csv, index=False)
+        overtime_csv = f"{export_folder}/overtime_warnings_{RUN_TS}.csv"
+        if export_table_csv(conn, 'overtime_warnings', overtime_csv):
             print(f"Overtime warnings exported to: {overtime_csv}")
         
         print(f"\n{'='*60}")
@@ -384,22 +586,31 @@ def export_all_reports(export_folder):
     except Exception as e:
         logging.error(f"Error exporting reports: {e}")
         print(f"An error occurred during export: {e}")
+    finally:
+        if conn is not None:
+            conn.close()
 
 def run_analysis(export_to_csv=True, export_folder=None):
-    """Run all analysis functions individually - DISPLAY ONLY, NO CSV EXPORT"""
+    """Run all analysis functions individually - DISPLAY ONLY, NO CSV EXPORT
+    
+    Returns the query results keyed by QUERIES name so export_all_reports can reuse them.
+    """
+    results = {}
+    conn = None
     try:
+        conn = sqlite3.connect(DB_PATH)
         print("\n" + "="*60)
         print("PAYROLL ANALYSIS REPORTS")
         print("="*60)
         
         print("\n--- TOP 5 EARNERS ---")
-        top_earners(export_csv=False, export_folder=None)  
+        results['top_earners'] = top_earners(export_csv=False, export_folder=None, conn=conn)  
         
         print("\n--- MONTHLY PAYROLL SUMMARY ---")
-        monthly_payroll_summary(export_csv=False, export_folder=None)  
+        results['monthly_payroll_summary'] = monthly_payroll_summary(export_csv=False, export_folder=None, conn=conn)  
         
         print("\n--- AVERAGE HOURS BY DEPARTMENT ---")
-        avg_hours_by_department(export_csv=False, export_folder=None)  
+        results['avg_hours_by_department'] = avg_hours_by_department(export_csv=False, export_folder=None, conn=conn)  
         
         print("\n" + "="*60)
         print("ANALYSIS COMPLETE")
@@ -411,70 +622,65 @@ def run_analysis(export_to_csv=True, export_folder=None):
     except Exception as e:
         logging.error(f"Error running analysis: {e}")
         print(f"An error occurred: {e}")
+    finally:
+        if conn is not None:
+            conn.close()
+    return results
 
 
 if __name__ == "__main__":
     print_file_locations()  # Show user where files will be saved
     
-    if len(sys.argv) < 2:
-        logging.error("Usage: python payroll_automation.py <data_folder>")
+    # Excel output is opt-in; Parquet is always written
+    export_to_excel = '--excel' in sys.argv[1:]
+    args = [arg for arg in sys.argv[1:] if arg != '--excel']
+    
+    if not args:
+        logging.error("Usage: python payroll_automation.py <data_folder> [--excel]")
         print("Alternative: Run analysis on existing database")
         
         # Creating export folder for analysis only
         export_folder = create_export_folder()
-        run_analysis()  
-        export_all_reports(export_folder)  
+        analysis_results = run_analysis()
+        export_all_reports(export_folder, analysis_results)
     else:
-        data_folder = sys.argv[1]
+        data_folder = args[0]
 
         if not os.path.isdir(data_folder):
             logging.error(f"Provided path is not a directory: {data_folder}")
             print("Running analysis on existing database instead...")
             
             export_folder = create_export_folder()
-            run_analysis()  
-            export_all_reports(export_folder)  
+            analysis_results = run_analysis()
+            export_all_reports(export_folder, analysis_results)
         else:
             logging.info(f"Using data folder: {data_folder}...")
             
-            # Store results from all files
-            all_dataframes = []
-            all_dept_summaries = []
-            all_warnings = []
-            
-            for file_name in os.listdir(data_folder):
-                if file_name.endswith(('.xlsx', '.xls', '.csv')):
-                    file_path = os.path.join(data_folder, file_name)
-                    logging.info(f"Processing file: {file_path}")
-                    
-                    raw_data = extract(file_path)
-                    if raw_data is not None:
-                        result = transform(raw_data)
-                        if result is not None:
-                            cleaned_data, dept_summary, warnings = result
-                            all_dataframes.append(cleaned_data)
-                            all_dept_summaries.append(dept_summary)
-                            all_warnings.append(warnings)
+            file_paths = [
+                os.path.join(data_folder, file_name)
+                for file_name in sorted(os.listdir(data_folder))
+                if file_name.endswith(('.xlsx', '.xls', '.csv'))
+            ]
             
-            # Load aggregated data 
-            if all_dataframes:
-                final_dept_summary = load_aggregated(all_dataframes, all_dept_summaries, all_warnings)
+            # Load aggregated data as each file finishes
+            final_dept_summary = load_aggregated(process_files(file_paths), export_to_excel)
+            if final_dept_summary is not None:
                 validate_load()
                 
                 # Create export folder and run analysis
                 export_folder = create_export_folder()
-                run_analysis()  
-                export_all_reports(export_folder)  
+                analysis_results = run_analysis()
+                export_all_reports(export_folder, analysis_results)
                 
                 logging.info("All files processed successfully.")
                 print(f"\nPayroll processing complete!")
-                print(f"Excel files: Check {SCRIPT_DIR}")
+                print(f"Parquet/Excel files: Check {SCRIPT_DIR}")
                 print(f"CSV files: Check {export_folder}")
                 print(f"Database: {DB_PATH}")
             else:
                 logging.error("No valid files were processed.")
                 print("Running analysis on existing database...")
                 export_folder = create_export_folder()
-                run_analysis() 
-                export_all_reports(export_folder) 
+                analysis_results = run_analysis()
+                export_all_reports(export_folder, analysis_results)
 